@@ -12,19 +12,37 @@ Usage:
 """
 
 import os
+import base64
 import time
 import json
 import csv
+import pickle
 import sqlite3
 import html
 import math
-import random
+import mmap
+import re
 import sys
+import zlib
 import urllib.parse
 import urllib.request
 import urllib.error
+import http.client
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+try:
+    import simdjson  # pysimdjson: lazy aircraft.json traversal
+except ImportError:
+    simdjson = None
 
 
 # ---------------- CONFIGURATION ----------------
@@ -43,6 +61,12 @@ MAX_SEEN_SEC = 60.0  # "live" if seen <= 60s
 TG_TOKEN = os.environ.get("TG_TOKEN", "")
 TG_CHAT_IDS = os.environ.get("TG_CHAT_IDS", "")  # "chat1,chat2"
 TG_CAPTION_MAX = 1024
+TG_API_HOST = "api.telegram.org"
+TG_MAX_WORKERS = 8  # Concurrent sends across chats
+
+# Built once per run: the pre-encoded constant form fields
+_TG_MSG_PARAMS = urllib.parse.urlencode({"parse_mode": "HTML", "disable_web_page_preview": "true"})
+_TG_PHOTO_PARAMS = urllib.parse.urlencode({"parse_mode": "HTML"})
 
 # Stations (fallback to env vars)
 TAR1090_BASE = os.environ.get("TAR1090_BASE", "")
@@ -52,6 +76,12 @@ AIRPLANESLIVE_BASE = os.environ.get("AIRPLANESLIVE_BASE", "")
 BOT_TITLE = "ADSB Alert Bot"
 FOOTER = "#adsb #alert"
 
+# List CSV columns, in file order
+LIST_FIELDS = (
+    "hex", "reg", "operator", "type", "icao_type", "cmpg", "tag1", "tag2", "tag3",
+    "category", "link", "img1", "img2", "img3", "img4",
+)
+
 # Conversion factors
 KNOTS_TO_KMH = 1.852
 FT_TO_M = 0.3048
@@ -91,6 +121,8 @@ def fmt_duration(sec: int) -> str:
 
 def fmt_kmh(gs) -> str:
     """Format ground speed in km/h."""
+    if type(gs) in (int, float):  # readsb's usual type, skip as_float()
+        return f"{gs * KNOTS_TO_KMH:.0f}"
     v = as_float(gs)
     if v is None:
         return ""
@@ -101,10 +133,10 @@ def fmt_alt_m_ft(alt) -> Tuple[str, str]:
     """Format altitude in meters and feet."""
     if alt is None:
         return "", ""
-    if isinstance(alt, str) and alt.lower() == "ground":
+    if alt == "ground":  # readsb emits this exact literal
         return "0", "0"
     
-    ft = as_float(alt)
+    ft = alt if type(alt) in (int, float) else as_float(alt)
     if ft is None:
         return "", ""
     m = ft * FT_TO_M
@@ -125,12 +157,47 @@ def today_key(now: int) -> str:
     return time.strftime("%Y-%m-%d", time.localtime(now))
 
 
+def _orjson_loads(buf):
+    """orjson.loads that replaces invalid UTF-8 instead of rejecting it."""
+    try:
+        return orjson.loads(buf)
+    except orjson.JSONDecodeError:
+        # orjson rejects invalid UTF-8; retry with replacement characters
+        return orjson.loads(bytes(buf).decode("utf-8", errors="replace"))
+
+
+def read_json(p: Path):
+    """Parse a JSON file, memory-mapped straight into orjson when available."""
+    if orjson is None:
+        return json.loads(p.read_text(encoding="utf-8", errors="replace"))
+
+    try:
+        with p.open("rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Empty or non-regular file, or no mmap support
+        return _orjson_loads(p.read_bytes())
+
+    try:
+        with memoryview(mm) as buf:
+            return _orjson_loads(buf)
+    finally:
+        mm.close()
+
+
+def fmt_timestamp(now: int) -> str:
+    """Format local and UTC timestamps for captions."""
+    ts_local = time.strftime("%d-%m-%Y %H:%M:%S", time.localtime(now))
+    ts_utc = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now))
+    return f"{ts_local} ({ts_utc} UTC)"
+
+
 def load_station_latlon() -> Tuple[Optional[float], Optional[float]]:
     """Load station coordinates from receiver.json or env vars."""
     try:
         p = Path(RECEIVER_JSON)
         if p.is_file():
-            rj = json.loads(p.read_text(encoding="utf-8", errors="replace"))
+            rj = read_json(p)
             lat = rj.get("lat")
             lon = rj.get("lon")
             if lat is not None and lon is not None:
@@ -146,15 +213,21 @@ def load_station_latlon() -> Tuple[Optional[float], Optional[float]]:
     return None, None
 
 
-def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two lat/lon points in km."""
+def make_station_haversine(st_lat: float, st_lon: float) -> Callable[[float, float], float]:
+    """Build a distance-from-station function (km) with station terms precomputed."""
     r = 6371.0
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi, dlmb = math.radians(lat2 - lat1), math.radians(lon2 - lon1)
-    a = (math.sin(dphi / 2) ** 2 + 
-         math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2)
-    c = 2 * math.asin(math.sqrt(a))
-    return r * c
+    phi1 = math.radians(st_lat)
+    cos_phi1 = math.cos(phi1)
+    lmb1 = math.radians(st_lon)
+
+    def haversine_km(lat2: float, lon2: float) -> float:
+        phi2 = math.radians(lat2)
+        dphi, dlmb = phi2 - phi1, math.radians(lon2) - lmb1
+        a = (math.sin(dphi / 2) ** 2 +
+             cos_phi1 * math.cos(phi2) * math.sin(dlmb / 2) ** 2)
+        return r * 2 * math.asin(math.sqrt(a))
+
+    return haversine_km
 
 
 # ---------------- LIST CACHE MANAGEMENT ----------------
@@ -168,25 +241,49 @@ def fetch_remote_list(name: str, url: str) -> Path:
     """
     Download remote CSV list with intelligent caching:
     - Use fresh cache if < TTL
+    - Revalidate stale cache with If-None-Match (304 keeps it)
     - Download if stale/missing
     - Fallback to cache on download failure
     """
     dst = _cache_path(name)
+    etag_path = dst.with_suffix(".etag")
     now = time.time()
 
     try:
         if dst.is_file():
-            age = now - dst.stat().st_mtime
-            if age < LIST_TTL_SEC:
+            # A 304 revalidation touches the .etag sidecar, not the CSV, so the
+            # CSV mtime (and the parsed-list snapshot keyed on it) stays put
+            checked = dst.stat().st_mtime
+            if etag_path.is_file():
+                checked = max(checked, etag_path.stat().st_mtime)
+            if now - checked < LIST_TTL_SEC:
                 return dst
 
         req = urllib.request.Request(url, headers={"User-Agent": "adsb-telegram/1.0"})
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            data = resp.read()
+        if dst.is_file() and etag_path.is_file():
+            req.add_header("If-None-Match", etag_path.read_text(encoding="utf-8").strip())
+
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                data = resp.read()
+                etag = resp.headers.get("ETag")
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                raise
+            e.close()
+            os.utime(etag_path)  # Not modified: restart the TTL
+            return dst
 
         tmp = dst.with_suffix(".csv.tmp")
         tmp.write_bytes(data)
         tmp.replace(dst)
+
+        if etag:
+            tmp = dst.with_suffix(".etag.tmp")
+            tmp.write_text(etag, encoding="utf-8")
+            tmp.replace(etag_path)
+        else:
+            etag_path.unlink(missing_ok=True)
         return dst
 
     except Exception:
@@ -200,6 +297,13 @@ def ensure_db() -> sqlite3.Connection:
     """Initialize SQLite state database."""
     Path(STATE_DB).parent.mkdir(parents=True, exist_ok=True)
     con = sqlite3.connect(STATE_DB)
+    # WAL + NORMAL: commits append to the WAL instead of syncing the db file;
+    # losing the last run on power loss is harmless for cooldown state
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("PRAGMA busy_timeout=5000")
+    con.execute("PRAGMA temp_store=MEMORY")
+    con.execute("PRAGMA mmap_size=67108864")
     cur = con.cursor()
     cur.execute("""
         CREATE TABLE IF NOT EXISTS seen (
@@ -214,43 +318,61 @@ def ensure_db() -> sqlite3.Connection:
     return con
 
 
-def get_state(con: sqlite3.Connection, hx: str) -> Optional[Tuple[int, int, str, int]]:
-    """Get aircraft state from DB."""
-    cur = con.cursor()
-    cur.execute("SELECT last_notify, first_seen, day, today_seen FROM seen WHERE hex=?", (hx,))
-    row = cur.fetchone()
-    if not row:
-        return None
-    return int(row[0]), int(row[1]), str(row[2]), int(row[3])
-
-
-def ensure_state_row(con: sqlite3.Connection, hx: str, now: int) -> Tuple[int, int, str, int]:
-    """Ensure aircraft has state row, reset daily stats."""
-    tkey = today_key(now)
-    st = get_state(con, hx)
+def load_states(con: sqlite3.Connection, hexes: List[str]) -> Dict[str, Tuple[int, int, str, int]]:
+    """Get state rows for several aircraft in one query."""
+    if not hexes:
+        return {}
     cur = con.cursor()
+    cur.execute(
+        "SELECT hex, last_notify, first_seen, day, today_seen FROM seen "
+        f"WHERE hex IN ({','.join('?' * len(hexes))})",
+        hexes,
+    )
+    return {
+        str(row[0]): (int(row[1]), int(row[2]), str(row[3]), int(row[4]))
+        for row in cur.fetchall()
+    }
+
+
+def ensure_state_row(
+    states: Dict[str, Tuple[int, int, str, int]],
+    hx: str,
+    now: int,
+    tkey: str,
+    upserts: List[Tuple[str, int, str]],
+) -> Tuple[int, int, str, int]:
+    """Resolve aircraft state, queueing new rows and daily resets."""
+    st = states.get(hx)
 
     if not st:
-        cur.execute(
-            "INSERT INTO seen(hex,last_notify,first_seen,day,today_seen) VALUES(?,?,?,?,?)",
-            (hx, 0, now, tkey, 0),
-        )
-        con.commit()
-        return 0, now, tkey, 0
+        upserts.append((hx, now, tkey))
+        states[hx] = (0, now, tkey, 0)
+        return states[hx]
 
     last_notify, first_seen, day, today_seen = st
 
     if day != tkey:
-        cur.execute(
-            "UPDATE seen SET day=?, today_seen=?, first_seen=? WHERE hex=?",
-            (tkey, 0, now, hx),
-        )
-        con.commit()
-        return last_notify, now, tkey, 0
+        upserts.append((hx, now, tkey))
+        states[hx] = (last_notify, now, tkey, 0)
+        return states[hx]
 
     return last_notify, first_seen, day, today_seen
 
 
+def save_state_rows(con: sqlite3.Connection, upserts: List[Tuple[str, int, str]]):
+    """Insert new rows and apply daily resets in one statement (caller commits)."""
+    con.executemany(
+        """
+        INSERT INTO seen(hex,last_notify,first_seen,day,today_seen) VALUES(?,0,?,?,0)
+        ON CONFLICT(hex) DO UPDATE SET
+            first_seen=CASE WHEN day<>excluded.day THEN excluded.first_seen ELSE first_seen END,
+            today_seen=CASE WHEN day<>excluded.day THEN 0 ELSE today_seen END,
+            day=excluded.day
+        """,
+        upserts,
+    )
+
+
 def should_notify(last_notify: int, now: int) -> bool:
     """Check if aircraft cooldown expired."""
     if last_notify <= 0:
@@ -258,82 +380,122 @@ def should_notify(last_notify: int, now: int) -> bool:
     return (now - last_notify) >= COOLDOWN_SEC
 
 
-def set_last_notify(con: sqlite3.Connection, hx: str, now: int):
-    """Mark aircraft as notified."""
-    cur = con.cursor()
-    cur.execute("UPDATE seen SET last_notify=? WHERE hex=?", (now, hx))
-    con.commit()
+def set_last_notify(con: sqlite3.Connection, hexes: List[str], now: int):
+    """Mark aircraft as notified (caller commits)."""
+    con.executemany(
+        "UPDATE seen SET last_notify=? WHERE hex=?",
+        [(now, hx) for hx in hexes],
+    )
 
 
-def close_session_add_today(con: sqlite3.Connection, hx: str, now: int, first_seen: int):
-    """Close tracking session and add duration to daily total."""
-    add = max(0, now - first_seen)
-    cur = con.cursor()
-    cur.execute(
+def close_session_add_today(con: sqlite3.Connection, sessions: List[Tuple[str, int]], now: int):
+    """Close tracking sessions and add durations to daily totals (caller commits)."""
+    con.executemany(
         "UPDATE seen SET today_seen=today_seen+?, first_seen=? WHERE hex=?",
-        (add, now, hx),
+        [(max(0, now - first_seen), now, hx) for hx, first_seen in sessions],
     )
-    con.commit()
 
 
 # ---------------- TELEGRAM API ----------------
+# One keep-alive HTTPS connection per worker thread, shared for the whole run
+_tg_local = threading.local()
+_TG_POOL = ThreadPoolExecutor(max_workers=TG_MAX_WORKERS, thread_name_prefix="tg")
+_TG_HEADERS = {
+    "Content-Type": "application/x-www-form-urlencoded",
+    "User-Agent": "adsb-telegram/1.0",
+}
+
+
 def _tg_destinations() -> List[str]:
     """Get list of Telegram chat IDs."""
     return [x.strip() for x in (TG_CHAT_IDS or "").split(",") if x.strip()]
 
 
-def _require_tg():
-    """Ensure Telegram credentials configured."""
-    if not TG_TOKEN or not _tg_destinations():
+def _tg_new_conn(timeout: float) -> http.client.HTTPSConnection:
+    """Open a connection to the Telegram API, tunneling through https_proxy if set."""
+    proxy = urllib.request.getproxies().get("https")
+    if not proxy or urllib.request.proxy_bypass(TG_API_HOST):
+        return http.client.HTTPSConnection(TG_API_HOST, timeout=timeout)
+
+    # Same env handling as urllib's ProxyHandler: CONNECT through the proxy
+    u = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    headers = {}
+    if u.username:
+        creds = f"{urllib.parse.unquote(u.username)}:{urllib.parse.unquote(u.password or '')}"
+        headers["Proxy-Authorization"] = "Basic " + base64.b64encode(creds.encode()).decode("ascii")
+    conn = http.client.HTTPSConnection(u.hostname, u.port or 8080, timeout=timeout)
+    conn.set_tunnel(TG_API_HOST, 443, headers=headers)
+    return conn
+
+
+def _tg_conn(timeout: float) -> http.client.HTTPSConnection:
+    """Get this thread's keep-alive connection to the Telegram API."""
+    conn = getattr(_tg_local, "conn", None)
+    if conn is None:
+        conn = _tg_new_conn(timeout)
+        _tg_local.conn = conn
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+    return conn
+
+
+def _tg_post(method: str, path: str, data: bytes, timeout: float) -> str:
+    """POST an encoded form to a Bot API method, reusing the TLS connection."""
+    for attempt in range(2):
+        conn = _tg_conn(timeout)
+        try:
+            conn.request("POST", path, body=data, headers=_TG_HEADERS)
+            resp = conn.getresponse()
+            body = resp.read().decode("utf-8", errors="replace")
+            break
+        except ConnectionError:
+            # Keep-alive connection dropped by the server, reconnect once
+            conn.close()
+            _tg_local.conn = None
+            if attempt:
+                raise
+        except Exception:
+            conn.close()
+            _tg_local.conn = None
+            raise
+
+    if resp.status != 200:
+        raise SystemExit(f"Telegram {method} failed: HTTP {resp.status} {body}")
+    return body
+
+
+def _tg_broadcast(method: str, params: str, timeout: float) -> str:
+    """Send the same Bot API call to all chats concurrently."""
+    token = TG_TOKEN
+    dests = _tg_destinations()
+    if not token or not dests:
         raise SystemExit("Missing TG_TOKEN or TG_CHAT_IDS environment variables")
 
+    # Path and message fields are built once, only chat_id differs per destination
+    path = f"/bot{token}/{method}"
+    results = list(_TG_POOL.map(
+        lambda chat_id: _tg_post(
+            method,
+            path,
+            f"chat_id={urllib.parse.quote_plus(chat_id)}&{params}".encode("utf-8"),
+            timeout,
+        ),
+        dests,
+    ))
+    return results[-1]
+
 
 def tg_send_message(text: str) -> str:
     """Send HTML-formatted message to all chats."""
-    _require_tg()
-    url = f"https://api.telegram.org/bot{TG_TOKEN}/sendMessage"
-    last = None
-
-    for chat_id in _tg_destinations():
-        data = urllib.parse.urlencode({
-            "chat_id": chat_id,
-            "text": text,
-            "parse_mode": "HTML",
-            "disable_web_page_preview": "true",
-        }).encode("utf-8")
-        req = urllib.request.Request(url, data=data, method="POST")
-        try:
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                last = resp.read().decode("utf-8", errors="replace")
-        except urllib.error.HTTPError as e:
-            body = e.read().decode("utf-8", errors="replace")
-            raise SystemExit(f"Telegram sendMessage failed: HTTP {e.code} {body}")
-
-    return last
+    params = urllib.parse.urlencode({"text": text})
+    return _tg_broadcast("sendMessage", f"{params}&{_TG_MSG_PARAMS}", timeout=10)
 
 
 def tg_send_photo(photo_url: str, caption: str) -> str:
     """Send photo with HTML caption to all chats."""
-    _require_tg()
-    url = f"https://api.telegram.org/bot{TG_TOKEN}/sendPhoto"
-    last = None
-
-    for chat_id in _tg_destinations():
-        data = urllib.parse.urlencode({
-            "chat_id": chat_id,
-            "photo": photo_url,
-            "caption": caption,
-            "parse_mode": "HTML",
-        }).encode("utf-8")
-        req = urllib.request.Request(url, data=data, method="POST")
-        try:
-            with urllib.request.urlopen(req, timeout=15) as resp:
-                last = resp.read().decode("utf-8", errors="replace")
-        except urllib.error.HTTPError as e:
-            body = e.read().decode("utf-8", errors="replace")
-            raise SystemExit(f"Telegram sendPhoto failed: HTTP {e.code} {body}")
-
-    return last
+    params = urllib.parse.urlencode({"photo": photo_url, "caption": caption})
+    return _tg_broadcast("sendPhoto", f"{params}&{_TG_PHOTO_PARAMS}", timeout=15)
 
 
 def send_photo_or_text(photo_url: str, caption: str):
@@ -350,14 +512,83 @@ def send_photo_or_text(photo_url: str, caption: str):
 
 
 # ---------------- AIRCRAFT LISTS ----------------
-def load_db_lists(remote_lists: List[Tuple[str, str]]) -> Dict[str, dict]:
+_ROW_PARSERS: Dict[int, Callable[[List[str]], List[str]]] = {}
+
+
+def _row_parser(ncols: int) -> Callable[[List[str]], List[str]]:
+    """
+    Get a CSV row parser specialized for rows with ncols columns.
+
+    The parser is generated as straight-line code (one strip per present
+    column, "" for missing ones) and compiled once per column count.
+    """
+    parse = _ROW_PARSERS.get(ncols)
+    if parse is None:
+        items = ["row[0].strip().upper()"] + [
+            f"row[{i}].strip()" if i < ncols else '""'
+            for i in range(1, len(LIST_FIELDS))
+        ]
+        src = f"def parse(row):\n    return [{', '.join(items)}]\n"
+        ns = {}
+        exec(compile(src, f"<row_parser_{ncols}>", "exec"), ns)
+        parse = _ROW_PARSERS[ncols] = ns["parse"]
+    return parse
+
+
+def _parse_list_csv(p: Path) -> List[List[str]]:
+    """Parse one cached CSV list into rows of LIST_FIELDS values."""
+    rows = []
+    with p.open("r", encoding="utf-8", errors="replace", newline="") as f:
+        r = csv.reader(f)
+        next(r, None)  # Skip header
+        for row in r:
+            if not row:
+                continue
+            values = _row_parser(len(row))(row)
+            if len(values[0]) != 6:
+                continue
+            rows.append(values)
+    return rows
+
+
+def _load_list_rows(p: Path) -> List[List[str]]:
+    """Load parsed list rows, reusing the pickled snapshot while the CSV is unchanged."""
+    pkl = p.with_suffix(".pkl")
+    mtime = p.stat().st_mtime
+
+    try:
+        with pkl.open("rb") as f:
+            snap = pickle.load(f)
+        if snap["mtime"] == mtime and snap["fields"] == LIST_FIELDS:
+            return snap["rows"]
+    except Exception:
+        pass  # Missing, stale format or corrupt: rebuild below
+
+    rows = _parse_list_csv(p)
+    try:
+        tmp = pkl.with_suffix(".pkl.tmp")
+        with tmp.open("wb") as f:
+            pickle.dump({"mtime": mtime, "fields": LIST_FIELDS, "rows": rows}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(pkl)
+    except OSError:
+        pass
+    return rows
+
+
+def load_db_lists(remote_lists: List[Tuple[str, str]]) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
     """
     Load curated aircraft lists from remote CSV files with caching.
+
+    Returns (hex_to_idx, columns): one list per field in LIST_FIELDS,
+    all indexed by the row number stored in hex_to_idx.
     
     Expected CSV format:
     hex,reg,operator,type,icao_type,cmpg,tag1,tag2,tag3,category,link,img1,img2,img3,img4
     """
-    db = {}
+    hex_to_idx = {}
+    columns = {k: [] for k in LIST_FIELDS}
+    cols = [columns[k] for k in LIST_FIELDS]
     local_files = []
 
     for name, url in remote_lists:
@@ -369,58 +600,38 @@ def load_db_lists(remote_lists: List[Tuple[str, str]]) -> Dict[str, dict]:
     for p in local_files:
         if not p.is_file():
             continue
-            
-        with p.open("r", encoding="utf-8", errors="replace", newline="") as f:
-            r = csv.reader(f)
-            next(r, None)  # Skip header
-            for row in r:
-                if not row:
-                    continue
-                hx = safe(row[0]).upper()
-                if len(hx) != 6:
-                    continue
-
-                def get(i): 
-                    return safe(row[i]) if i < len(row) else ""
-                    
-                db[hx] = {
-                    "hex": hx,
-                    "reg": get(1),
-                    "operator": get(2),
-                    "type": get(3),
-                    "icao_type": get(4),
-                    "cmpg": get(5),
-                    "tag1": get(6),
-                    "tag2": get(7),
-                    "tag3": get(8),
-                    "category": get(9),
-                    "link": get(10),
-                    "img1": get(11),
-                    "img2": get(12),
-                    "img3": get(13),
-                    "img4": get(14),
-                }
-    return db
+
+        for values in _load_list_rows(p):
+            hx = values[0]
+            idx = hex_to_idx.get(hx)
+            if idx is None:
+                hex_to_idx[hx] = len(cols[0])
+                for col, v in zip(cols, values):
+                    col.append(v)
+            else:
+                # Later lists override earlier entries for the same hex
+                for col, v in zip(cols, values):
+                    col[idx] = v
+    return hex_to_idx, columns
+
+
+def db_info(columns: Dict[str, List[str]], idx: int) -> dict:
+    """Build the field dict for one list entry."""
+    return {k: columns[k][idx] for k in LIST_FIELDS}
+
+
+# Photo URL inside a list field, possibly wrapped in markdown "[..](..)";
+# anything of 20 chars or less is not a usable image link
+_URL_RE = re.compile(r"https://[^\s\])]{13,}")
 
 
 def pick_photo_urls(info: dict) -> List[str]:
-    """Extract and clean photo URLs from aircraft info."""
+    """Extract and clean photo URLs from aircraft info (at most one per field)."""
     urls = []
     for k in ("img1", "img2", "img3", "img4"):
-        u = safe(info.get(k, ""))
-        if 'https://' in u:
-            start = u.find('https://')
-            # Clean URL by finding first ] ) or space after start
-            for end in [u.find(c, start) for c in ']) ']:
-                if end > start:
-                    clean_u = u[start:end].rstrip(')')
-                    break
-            else:
-                clean_u = u[start:]
-            if len(clean_u) > 20:
-                urls.append(clean_u)
-    
-    random.shuffle(urls)
+        m = _URL_RE.search(info.get(k, "") or "")
+        if m:
+            urls.append(m.group())
     return urls
 
 
@@ -431,14 +642,27 @@ def build_tags(info: dict) -> str:
 
 
 # ---------------- CAPTION BUILDER ----------------
+_CAPTION_TMPL = (
+    "<b>{title}</b>\n"
+    "<b>{tail}</b> • <b>ICAO:</b> <code>{hx}</code>{icao_type}\n"
+    "{flight}{operator}{typdesc}"
+    "{alt}{speed}{dist}"
+    "<b>Vista oggi:</b> <code>{today_total}</code> • "
+    "<b>In vista:</b> <code>{in_session}</code>{last_msg} • "
+    "<b>Sorgente:</b> <code>{src}</code>\n"
+    "{ts}\n"
+    "{footer}{tags}{links}"
+)
+
+
 def fmt_caption(
     info: dict, 
     live: dict, 
     now: int, 
     first_seen: int, 
     today_seen: int, 
-    st_lat: Optional[float], 
-    st_lon: Optional[float]
+    ts: str,
+    hav: Optional[Callable[[float, float], float]]
 ) -> str:
     """Build rich HTML caption for Telegram."""
     hx = safe(info.get("hex", "")).upper()
@@ -475,9 +699,9 @@ def fmt_caption(
         alat = live.get("lat")
         alon = live.get("lon")
         try:
-            if (st_lat and st_lon and alat is not None and alon is not None and 
+            if (hav and alat is not None and alon is not None and 
                 isinstance(alat, (int, float)) and isinstance(alon, (int, float))):
-                dkm = haversine_km(float(st_lat), float(st_lon), float(alat), float(alon))
+                dkm = hav(float(alat), float(alon))
                 dist_txt = f"{dkm:.1f}"
         except Exception:
             pass
@@ -488,11 +712,6 @@ def fmt_caption(
     if rdir is not None:
         dir_txt = f"{rdir:.0f}"
     
-    # Timestamps
-    ts_local = time.strftime("%d-%m-%Y %H:%M:%S", time.localtime(now))
-    ts_utc = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now))
-    ts = f"{ts_local} ({ts_utc} UTC)"
-    
     # Build links
     links = []
     if TAR1090_BASE:
@@ -505,51 +724,47 @@ def fmt_caption(
     # Tags
     tags = build_tags(info)
     
-    # Assemble caption lines
-    lines = [f"<b>{h(BOT_TITLE)}</b>"]
-    
-    top = f"<b>{h(tail) if tail else '-'}</b> • <b>ICAO:</b> <code>{h(hx)}</code>"
+    # Fill the caption template; optional items stay empty
+    esc = html.escape
+    fields = defaultdict(str)
+    fields.update(
+        title=esc(BOT_TITLE.strip(), quote=False),
+        tail=esc(tail, quote=False) if tail else "-",
+        hx=esc(hx, quote=False),
+        today_total=today_total,
+        in_session=in_session,
+        src=src,
+        ts=ts,
+        footer=FOOTER,
+    )
     if icao_type:
-        top += f" • <code>{h(icao_type)}</code>"
-    lines.append(top)
-    
+        fields["icao_type"] = f" • <code>{esc(icao_type, quote=False)}</code>"
     if flt:
-        lines.append(f"<b>Volo:</b> <code>{h(flt)}</code>")
+        fields["flight"] = f"<b>Volo:</b> <code>{esc(flt, quote=False)}</code>\n"
     if operator_:
-        lines.append(f"<b>Gestore:</b> {h(operator_)}")
+        fields["operator"] = f"<b>Gestore:</b> {esc(operator_, quote=False)}\n"
     if typdesc:
-        lines.append(f"<b>Aeromobile:</b> {h(typdesc)}")
+        fields["typdesc"] = f"<b>Aeromobile:</b> {esc(typdesc, quote=False)}\n"
     
-    # Live status
-    live_parts = []
+    # Live status (formatted numbers, nothing to escape)
     if alt_m and alt_ft:
-        live_parts.append(f"<b>Alt:</b> <code>{h(alt_m)}</code> m (<code>{h(alt_ft)}</code> ft)")
+        fields["alt"] = f"<b>Alt:</b> <code>{alt_m}</code> m (<code>{alt_ft}</code> ft) • "
     if kmh:
-        live_parts.append(f"<b>Vel:</b> <code>{h(kmh)}</code> km/h")
+        fields["speed"] = f"<b>Vel:</b> <code>{kmh}</code> km/h • "
     if dist_txt:
         if dir_txt:
-            live_parts.append(f"<b>Dist:</b> <code>{h(dist_txt)}</code> km @ <code>{h(dir_txt)}</code>°")
+            fields["dist"] = f"<b>Dist:</b> <code>{dist_txt}</code> km @ <code>{dir_txt}</code>° • "
         else:
-            live_parts.append(f"<b>Dist:</b> <code>{h(dist_txt)}</code> km")
-    
-    live_parts.extend([
-        f"<b>Vista oggi:</b> <code>{h(today_total)}</code>",
-        f"<b>In vista:</b> <code>{h(in_session)}</code>"
-    ])
-    
+            fields["dist"] = f"<b>Dist:</b> <code>{dist_txt}</code> km • "
     if last_txt:
-        live_parts.append(f"<b>Ultimo msg:</b> <code>{h(last_txt)}</code>")
-    live_parts.append(f"<b>Sorgente:</b> <code>{h(src)}</code>")
-    
-    lines.append(" • ".join(live_parts))
-    lines.extend([ts, FOOTER])
+        fields["last_msg"] = f" • <b>Ultimo msg:</b> <code>{last_txt}</code>"
     
     if tags:
-        lines.append(h(tags))
+        fields["tags"] = "\n" + esc(tags, quote=False)
     if links:
-        lines.append(" | ".join(links))
+        fields["links"] = "\n" + " | ".join(links)
     
-    return "\n".join(lines)
+    return _CAPTION_TMPL.format_map(fields)
 
 
 def is_recent(live: dict) -> bool:
@@ -563,6 +778,38 @@ def is_recent(live: dict) -> bool:
         return True
 
 
+def load_live_aircraft(p: Path, hex_to_idx: Dict[str, int]) -> Tuple[List[Tuple[str, int, dict]], int]:
+    """
+    Read aircraft.json in a single pass, keeping only aircraft in the lists.
+
+    Returns ([(hex, list index, aircraft dict), ...], total aircraft count).
+    With pysimdjson the document is traversed lazily and only matching
+    aircraft are turned into dicts; others cost a single hex read.
+    """
+    lazy = simdjson is not None
+    if lazy:
+        parser = simdjson.Parser()
+        try:
+            aircraft = parser.load(str(p)).get("aircraft") or []
+        except UnicodeDecodeError:
+            # simdjson rejects invalid UTF-8, read_json replaces it
+            lazy = False
+    if not lazy:
+        aircraft = read_json(p).get("aircraft", [])
+
+    matched = []
+    for a in aircraft:
+        raw = a.get("hex")
+        if not raw:
+            continue
+        # readsb emits bare lowercase hex, no need for safe()'s strip here
+        hx = raw.upper()
+        idx = hex_to_idx.get(hx)
+        if idx is not None:
+            matched.append((hx, idx, a.as_dict() if lazy else a))
+    return matched, len(aircraft)
+
+
 # ---------------- MAIN LOOP ----------------
 def main():
     """Main monitoring loop."""
@@ -572,8 +819,8 @@ def main():
         # Add your lists here following the CSV format
     ]
     
-    db = load_db_lists(REMOTE_LISTS)
-    if not db:
+    hex_to_idx, columns = load_db_lists(REMOTE_LISTS)
+    if not hex_to_idx:
         print("No aircraft loaded from lists", file=sys.stderr)
         sys.exit(1)
 
@@ -583,62 +830,72 @@ def main():
         raise SystemExit(f"Aircraft data not found: {READSB_AIRCRAFT_JSON}")
 
     st_lat, st_lon = load_station_latlon()
-    j = json.loads(p.read_text(encoding="utf-8", errors="replace"))
-    aircraft = j.get("aircraft", [])
+    hav = make_station_haversine(st_lat, st_lon) if st_lat and st_lon else None
+    matched, live_count = load_live_aircraft(p, hex_to_idx)
 
     now = int(time.time())
+    tkey = today_key(now)
+    ts = fmt_timestamp(now)
     sent = 0
 
-    for a in aircraft:
-        hx = safe(a.get("hex", "")).upper()
-        if len(hx) != 6:
-            continue
-
-        info = db.get(hx)
-        if not info:
-            continue
+    # State changes are queued and written in a single transaction per run;
+    # flushed even if a send aborts so already-sent alerts stay recorded
+    states = load_states(con, [hx for hx, _idx, _a in matched])
+    upserts = []  # (hex, now, day)
+    closed = []  # (hex, first_seen)
+    notified = []
 
-        last_notify, first_seen, _day, today_seen = ensure_state_row(con, hx, now)
-
-        # Skip if too old
-        seen_s = as_float(a.get("seen"))
-        if seen_s is not None and seen_s > MAX_SEEN_SEC:
-            close_session_add_today(con, hx, now, first_seen)
-            continue
-
-        if not is_recent(a):
-            close_session_add_today(con, hx, now, first_seen)
-            continue
-
-        # Send notification if cooldown expired
-        if should_notify(last_notify, now):
-            caption = fmt_caption(info, a, now, first_seen, today_seen, st_lat, st_lon)
-            photo_urls = pick_photo_urls(info)
-            sent_photo = False
-
-            # Try photos first
-            for photo in photo_urls:
-                try:
-                    send_photo_or_text(photo, caption)
-                    sent_photo = True
-                    break
-                except Exception:
-                    continue  # Try next photo
-
-            # Fallback to text
-            if not sent_photo:
-                try:
-                    tg_send_message(caption)
-                    sent_photo = True
-                except Exception:
-                    pass
-
-            if sent_photo:
-                set_last_notify(con, hx, now)
-                sent += 1
+    try:
+        for hx, idx, a in matched:
+            last_notify, first_seen, _day, today_seen = ensure_state_row(
+                states, hx, now, tkey, upserts
+            )
+
+            # Skip if too old
+            if not is_recent(a):
+                closed.append((hx, first_seen))
+                continue
+
+            # Send notification if cooldown expired
+            if should_notify(last_notify, now):
+                info = db_info(columns, idx)
+                caption = fmt_caption(info, a, now, first_seen, today_seen, ts, hav)
+                photo_urls = pick_photo_urls(info)
+                if photo_urls:
+                    # Start from a photo that varies per aircraft and day but
+                    # stays the same between runs, then try the rest in order
+                    start = zlib.crc32(f"{hx}{tkey}".encode()) % len(photo_urls)
+                    photo_urls = photo_urls[start:] + photo_urls[:start]
+                sent_photo = False
+
+                # Try photos first
+                for photo in photo_urls:
+                    try:
+                        send_photo_or_text(photo, caption)
+                        sent_photo = True
+                        break
+                    except Exception:
+                        continue  # Try next photo
+
+                # Fallback to text
+                if not sent_photo:
+                    try:
+                        tg_send_message(caption)
+                        sent_photo = True
+                    except Exception:
+                        pass
+
+                if sent_photo:
+                    notified.append(hx)
+                    sent += 1
+    finally:
+        with con:
+            save_state_rows(con, upserts)
+            close_session_add_today(con, closed, now)
+            set_last_notify(con, notified, now)
 
     con.close()
-    print(f"[{time.strftime('%H:%M:%S')}] sent={sent} db={len(db)} live={len(aircraft)}", 
+    print(f"[{time.strftime('%H:%M:%S')}] sent={sent} db={len(hex_to_idx)} live={live_count}", 
           file=sys.stderr)
 
 